@@ -5,8 +5,10 @@ import os
 import asyncio
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from llm_handler import extract_tasks_from_text, get_priority_label
-from storage import load_tasks, save_tasks, add_tasks, delete_task, update_task, get_all_tasks, init_db
+from llm_handler import extract_tasks_from_text, get_priority_label, GroqUnavailableError
+from storage import load_tasks, save_tasks, add_tasks, delete_task, update_task, get_all_tasks
+from storage import build_task, apply_operation, probe_db, is_db_down, mark_db_down, DB_ERRORS
+import offline_queue
 
 load_dotenv()
 
@@ -98,6 +100,28 @@ def format_task_embed(tasks: list) -> discord.Embed:
     return embed
 
 
+def format_added_embed(added: list, queued: bool = False) -> discord.Embed:
+    now = datetime.now()
+    embed = discord.Embed(title=f"✅ {len(added)} Tugas Ditambahkan!", color=0x3498db)
+    for t in added:
+        priority = get_priority_label(t.get("deadline"), now)
+        val = [f"📅 {format_deadline(t.get('deadline', '—'))}"]
+        if t.get("description"):
+            desc = t["description"]
+            if len(desc) > 80:
+                desc = desc[:77] + "..."
+            val.append(f"📝 {desc}")
+        link_parts = render_links(t.get("links", []))
+        if link_parts:
+            val.append("🔗 " + "  ·  ".join(link_parts))
+        embed.add_field(name=f"{priority} {t['name']}", value="\n".join(val), inline=False)
+    if queued:
+        embed.set_footer(text="⏳ Tersimpan lokal, akan disinkronkan otomatis")
+    else:
+        embed.set_footer(text="Ketik !jadwal untuk lihat semua tugas")
+    return embed
+
+
 def parse_snooze_duration(duration_str: str) -> timedelta | None:
     """Parse '2h', '1d', '30m' jadi timedelta."""
     duration_str = duration_str.strip().lower()
@@ -181,15 +205,132 @@ async def reminder_loop():
         await asyncio.sleep(60)  # cek tiap menit
 
 
+# ─────────────────────────────────────────────
+# BACKGROUND: REPLAY ANTRIAN OFFLINE
+# ─────────────────────────────────────────────
+
+async def notify_dead_letter(payload: dict):
+    """Kabari user kalau teks yang sudah disimpan gagal diproses, sertakan teksnya untuk di-paste ulang."""
+    channel = bot.get_channel(payload["channel_id"])
+    if not channel:
+        return
+    quoted = "\n".join(f"> {line}" for line in payload.get("text", "").splitlines())
+    msg = (
+        f"<@{payload['user_id']}> ⚠️ Teks yang tadi disimpan gagal diproses. "
+        f"Silakan paste ulang:\n{quoted}"
+    )
+    # Batas Discord 2000 karakter berlaku untuk pesan akhir (termasuk prefix "> ")
+    if len(msg) > 2000:
+        msg = msg[:1997] + "..."
+    # Teks user di-quote ulang atas nama bot: jangan ikut nge-ping @everyone/role
+    await channel.send(msg, allowed_mentions=discord.AllowedMentions(users=True, everyone=False, roles=False))
+
+
+async def replay_extract_queue():
+    """Proses teks yang tertunda karena Groq down; hasilnya masuk jalur antrian DB."""
+    while (entry := offline_queue.peek(offline_queue.EXTRACT_KINDS)) is not None:
+        seq, kind, payload = entry
+        try:
+            extracted = await extract_tasks_from_text(payload["text"])
+        except GroqUnavailableError as e:
+            print(f"⏳ Replay ekstraksi tertunda, Groq masih down: {e}")
+            return
+        except Exception as e:
+            print(f"Replay error, entri #{seq} dipindah ke dead_letter: {kind} ({e})")
+            offline_queue.dead_letter(seq, str(e))
+            await notify_dead_letter(payload)
+            continue
+
+        added = [build_task(t) for t in extracted]
+        # Simpan hasil ekstraksi (dengan ID tetap) di entri yang sama, supaya kalau
+        # insert gagal/terulang tidak ada ekstraksi & tugas ganda
+        offline_queue.replace(seq, "add", {**payload, "tasks": added})
+        offline_queue.snapshot_add(added)
+
+
+async def replay_db_queue():
+    """Putar ulang mutasi DB sesuai urutan, berhenti kalau Postgres masih down."""
+    # Probe juga saat antrian kosong tapi DB ditandai down, supaya status down bisa dibersihkan
+    if not offline_queue.has_pending(offline_queue.DB_KINDS) and not is_db_down():
+        return
+    if not await asyncio.to_thread(probe_db):
+        return
+
+    while (entry := offline_queue.peek(offline_queue.DB_KINDS)) is not None:
+        seq, kind, payload = entry
+        try:
+            result = await asyncio.to_thread(apply_operation, kind, payload)
+        except DB_ERRORS as e:
+            print(f"⏳ Replay tertunda, database masih down: {e}")
+            mark_db_down()
+            return
+        except Exception as e:
+            print(f"Replay error, entri #{seq} dipindah ke dead_letter: {kind} {payload} ({e})")
+            offline_queue.dead_letter(seq, str(e))
+            # Tugas yang gagal masuk DB jangan tetap tampil dari snapshot
+            if kind == "add":
+                for t in payload["tasks"]:
+                    offline_queue.snapshot_delete(t["id"])
+            if payload.get("channel_id"):
+                await notify_dead_letter(payload)
+            continue
+
+        # Snapshot tidak diisi ulang di sini: tugasnya sudah masuk saat entri dibuat,
+        # dan update/delete yang masih antre setelahnya sudah diterapkan ke snapshot
+        offline_queue.ack(seq)
+
+        # Hasil ekstraksi yang tertunda dikabarkan ke channel asalnya
+        if kind != "add" or not payload.get("channel_id"):
+            continue
+        channel = bot.get_channel(payload["channel_id"])
+        if not channel:
+            continue
+        mention = f"<@{payload['user_id']}>"
+        if result:
+            await channel.send(mention, embed=format_added_embed(result))
+        else:
+            await channel.send(f"{mention} 🤖 Hmm, tidak ada tugas yang terdeteksi dari teks yang tadi disimpan.")
+
+    print("✅ Antrian offline tersinkron")
+
+
+async def replay_offline_queue():
+    """Ekstraksi dan mutasi DB diputar ulang terpisah, jadi Groq down tidak menahan tulis ke DB."""
+    await replay_extract_queue()
+    await replay_db_queue()
+
+
+async def replay_loop():
+    await bot.wait_until_ready()
+    print("🔁 Replay loop started")
+
+    while not bot.is_closed():
+        try:
+            await replay_offline_queue()
+        except Exception as e:
+            print(f"Replay error: {e}")
+
+        await asyncio.sleep(30)  # cek tiap 30 detik
+
+
 # ─────────────────────────────────────────────
 # BOT EVENTS
 # ─────────────────────────────────────────────
 
+@bot.event
+async def setup_hook():
+    # Dipanggil sekali saat login; on_ready bisa terpanggil ulang tiap reconnect,
+    # jadi loop background (terutama replay) jangan dimulai dari sana
+    offline_queue.init_queue()
+    if not await asyncio.to_thread(probe_db):
+        print("⚠️ Database tidak tersedia, jalan dalam mode offline")
+    bot.loop.create_task(reminder_loop())
+    bot.loop.create_task(replay_loop())
+
+
 @bot.event
 async def on_ready():
-    init_db()
     print(f"✅ Bot online: {bot.user}")
-    bot.loop.create_task(reminder_loop())
 
 
 @bot.event
@@ -428,33 +569,28 @@ async def on_message(message):
 
     # ── AUTO-DETECT TUGAS DARI TEKS BEBAS ──
     if len(content) > 20 and not content.startswith("!"):
-        async with message.channel.typing():
-            extracted = await extract_tasks_from_text(content)
+        try:
+            async with message.channel.typing():
+                extracted = await extract_tasks_from_text(content)
+        except GroqUnavailableError as e:
+            print(f"⚠️ Groq tidak tersedia, teks masuk antrian offline: {e}")
+            offline_queue.enqueue("extract", {
+                "text": content,
+                "channel_id": message.channel.id,
+                "user_id": user_id,
+            })
+            await message.channel.send("📥 AI sedang tidak bisa dihubungi. Teksmu sudah disimpan dan akan diproses otomatis begitu layanan pulih.")
+            return
 
         if not extracted:
             await message.channel.send("🤖 Hmm, tidak ada tugas yang terdeteksi dari teks itu.")
             return
 
         tasks = load_tasks()
-        added = add_tasks(tasks, extracted)
+        added, queued = add_tasks(tasks, extracted)
         save_tasks(tasks)
 
-        now = datetime.now()
-        embed = discord.Embed(title=f"✅ {len(added)} Tugas Ditambahkan!", color=0x3498db)
-        for t in added:
-            priority = get_priority_label(t.get("deadline"), now)
-            val = [f"📅 {format_deadline(t.get('deadline', '—'))}"]
-            if t.get("description"):
-                desc = t["description"]
-                if len(desc) > 80:
-                    desc = desc[:77] + "..."
-                val.append(f"📝 {desc}")
-            link_parts = render_links(t.get("links", []))
-            if link_parts:
-                val.append("🔗 " + "  ·  ".join(link_parts))
-            embed.add_field(name=f"{priority} {t['name']}", value="\n".join(val), inline=False)
-        embed.set_footer(text="Ketik !jadwal untuk lihat semua tugas")
-        await message.channel.send(embed=embed)
+        await message.channel.send(embed=format_added_embed(added, queued=queued))
         return
 
     await bot.process_commands(message)
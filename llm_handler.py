@@ -32,6 +32,10 @@ Jawab HANYA dengan JSON array seperti ini (tanpa penjelasan lain, tanpa markdown
 Jika tidak ada tugas sama sekali dalam teks, jawab dengan array kosong: []"""
 
 
+class GroqUnavailableError(Exception):
+    """Groq sedang down / kena rate limit — request boleh dicoba ulang nanti."""
+
+
 async def extract_tasks_from_text(text: str) -> list:
     if not GROQ_API_KEY:
         raise ValueError("GROQ_API_KEY tidak ditemukan di environment variable!")
@@ -50,19 +54,25 @@ async def extract_tasks_from_text(text: str) -> list:
         ]
     }
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            GROQ_URL,
-            json=payload,
-            headers={
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            timeout=30.0
-        )
-        if resp.status_code != 200:
-            raise Exception(f"Groq API error {resp.status_code}: {resp.text}")
-        data = resp.json()
+    try:
+        async with httpx.AsyncClient() as client:
+            resp = await client.post(
+                GROQ_URL,
+                json=payload,
+                headers={
+                    "Authorization": f"Bearer {GROQ_API_KEY}",
+                    "Content-Type": "application/json"
+                },
+                timeout=30.0
+            )
+    except httpx.TransportError as e:
+        raise GroqUnavailableError(f"Groq tidak bisa dihubungi: {e}") from e
+
+    if resp.status_code == 429 or resp.status_code >= 500:
+        raise GroqUnavailableError(f"Groq API error {resp.status_code}: {resp.text}")
+    if resp.status_code != 200:
+        raise Exception(f"Groq API error {resp.status_code}: {resp.text}")
+    data = resp.json()
 
     raw_text = data["choices"][0]["message"]["content"].strip()
 
@@ -0,0 +1,156 @@
+import os
+import json
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+QUEUE_PATH = os.environ.get("OFFLINE_QUEUE_PATH", "offline_queue.db")
+
+# Dua jalur antrian: mutasi DB harus urut sesama mutasi DB, sedangkan ekstraksi
+# (Groq) berjalan terpisah karena belum ada mutasi yang bisa bergantung padanya
+DB_KINDS = ("add", "delete", "update")
+EXTRACT_KINDS = ("extract",)
+
+
+@contextmanager
+def get_conn():
+    conn = sqlite3.connect(QUEUE_PATH)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def init_queue():
+    """Buat tabel antrian & snapshot lokal kalau belum ada."""
+    with get_conn() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS queue (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS dead_letter (
+                seq INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at TEXT,
+                error TEXT,
+                failed_at TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS snapshot (
+                id TEXT PRIMARY KEY,
+                data TEXT NOT NULL
+            )
+        """)
+
+
+# ─────────────────────────────────────────────
+# ANTRIAN (write-ahead, diputar ulang sesuai urutan seq)
+# ─────────────────────────────────────────────
+
+def enqueue(kind: str, payload: dict) -> int:
+    with get_conn() as conn:
+        cur = conn.execute(
+            "INSERT INTO queue (kind, payload, created_at) VALUES (?, ?, ?)",
+            (kind, json.dumps(payload), datetime.now().strftime("%Y-%m-%d %H:%M"))
+        )
+        return cur.lastrowid
+
+
+def _kind_filter(kinds: tuple) -> str:
+    return f"WHERE kind IN ({', '.join('?' for _ in kinds)})"
+
+
+def has_pending(kinds: tuple = DB_KINDS + EXTRACT_KINDS) -> bool:
+    with get_conn() as conn:
+        row = conn.execute(f"SELECT 1 FROM queue {_kind_filter(kinds)} LIMIT 1", kinds).fetchone()
+    return row is not None
+
+
+def peek(kinds: tuple = DB_KINDS + EXTRACT_KINDS) -> tuple | None:
+    """Ambil entri tertua dari jalur `kinds`: (seq, kind, payload), atau None kalau kosong."""
+    with get_conn() as conn:
+        row = conn.execute(
+            f"SELECT seq, kind, payload FROM queue {_kind_filter(kinds)} ORDER BY seq LIMIT 1",
+            kinds
+        ).fetchone()
+    if row is None:
+        return None
+    return row[0], row[1], json.loads(row[2])
+
+
+def replace(seq: int, kind: str, payload: dict):
+    """Ganti isi entri tanpa mengubah posisinya di antrian."""
+    with get_conn() as conn:
+        conn.execute(
+            "UPDATE queue SET kind = ?, payload = ? WHERE seq = ?",
+            (kind, json.dumps(payload), seq)
+        )
+
+
+def ack(seq: int):
+    with get_conn() as conn:
+        conn.execute("DELETE FROM queue WHERE seq = ?", (seq,))
+
+
+def dead_letter(seq: int, error: str):
+    """Pindahkan entri yang gagal permanen ke tabel dead_letter (tidak dihapus)."""
+    with get_conn() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO dead_letter (seq, kind, payload, created_at, error, failed_at)
+            SELECT seq, kind, payload, created_at, ?, ? FROM queue WHERE seq = ?
+        """, (error, datetime.now().strftime("%Y-%m-%d %H:%M"), seq))
+        conn.execute("DELETE FROM queue WHERE seq = ?", (seq,))
+
+
+# ─────────────────────────────────────────────
+# SNAPSHOT (dipakai untuk baca selama DB down)
+# ─────────────────────────────────────────────
+
+def save_snapshot(tasks: list):
+    with get_conn() as conn:
+        conn.execute("DELETE FROM snapshot")
+        conn.executemany(
+            "INSERT INTO snapshot (id, data) VALUES (?, ?)",
+            [(t["id"], json.dumps(t)) for t in tasks]
+        )
+
+
+def load_snapshot() -> list:
+    with get_conn() as conn:
+        rows = conn.execute("SELECT data FROM snapshot").fetchall()
+    tasks = [json.loads(r[0]) for r in rows]
+    # Samakan urutan dengan query DB: deadline NULLS LAST
+    return sorted(tasks, key=lambda t: (t.get("deadline") is None, t.get("deadline") or ""))
+
+
+def snapshot_add(tasks: list):
+    with get_conn() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO snapshot (id, data) VALUES (?, ?)",
+            [(t["id"], json.dumps(t)) for t in tasks]
+        )
+
+
+def snapshot_delete(task_id: str) -> bool:
+    with get_conn() as conn:
+        cur = conn.execute("DELETE FROM snapshot WHERE id = ?", (task_id,))
+        return cur.rowcount > 0
+
+
+def snapshot_update(task_id: str, fields: dict) -> bool:
+    with get_conn() as conn:
+        row = conn.execute("SELECT data FROM snapshot WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            return False
+        task = json.loads(row[0])
+        task.update(fields)
+        conn.execute("UPDATE snapshot SET data = ? WHERE id = ?", (json.dumps(task), task_id))
+    return True
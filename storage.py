@@ -4,11 +4,20 @@ import uuid
 from datetime import datetime
 import psycopg2
 from psycopg2.extras import RealDictCursor
+import offline_queue
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
+# Error yang berarti DB sedang tidak bisa dihubungi (bukan salah query)
+DB_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+# Ditandai saat koneksi DB gagal. Selama True, baca/tulis langsung ke snapshot/antrian
+# tanpa connect ulang (tiap percobaan bisa menahan event loop sampai connect_timeout).
+# Dibersihkan oleh probe_db() di replay loop.
+_db_down = False
+
 def get_conn():
-    return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor, connect_timeout=5)
 
 def init_db():
     """Buat tabel kalau belum ada."""
@@ -27,47 +36,78 @@ def init_db():
             """)
         conn.commit()
 
+def mark_db_down():
+    global _db_down
+    _db_down = True
+
+def is_db_down() -> bool:
+    return _db_down
+
+def probe_db() -> bool:
+    """Cek koneksi DB (sekalian pastikan tabel ada) dan perbarui status DB down."""
+    global _db_down
+    try:
+        init_db()
+    except DB_ERRORS:
+        _db_down = True
+        return False
+    _db_down = False
+    return True
+
 def load_tasks() -> list:
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT * FROM tasks ORDER BY deadline NULLS LAST")
-            rows = cur.fetchall()
-    return [dict(r) for r in rows]
+    # Selama DB down atau antrian offline belum kosong, DB belum mencerminkan perubahan terbaru
+    if _db_down or offline_queue.has_pending(offline_queue.DB_KINDS):
+        return offline_queue.load_snapshot()
+    try:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT * FROM tasks ORDER BY deadline NULLS LAST")
+                rows = cur.fetchall()
+    except DB_ERRORS as e:
+        print(f"⚠️ Database tidak tersedia, pakai snapshot lokal: {e}")
+        mark_db_down()
+        return offline_queue.load_snapshot()
+    tasks = [dict(r) for r in rows]
+    offline_queue.save_snapshot(tasks)
+    return tasks
 
 def save_tasks(tasks: list):
     """Tidak dipakai lagi — operasi langsung ke DB."""
     pass
 
-def add_tasks(tasks: list, new_tasks: list) -> list:
-    added = []
+def build_task(t: dict) -> dict:
+    """Bentuk task lengkap (termasuk ID) dari hasil ekstraksi LLM."""
+    return {
+        "id": str(uuid.uuid4())[:8],
+        "name": t.get("name", "Tugas tanpa nama"),
+        "description": t.get("description", ""),
+        "deadline": t.get("deadline"),
+        "links": [
+            l if isinstance(l, dict) else {"label": "Link", "url": l}
+            for l in t.get("links", [])
+        ],
+        "reminded": [],
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M")
+    }
+
+def _insert_tasks(tasks: list) -> list:
     with get_conn() as conn:
         with conn.cursor() as cur:
-            for t in new_tasks:
-                task = {
-                    "id": str(uuid.uuid4())[:8],
-                    "name": t.get("name", "Tugas tanpa nama"),
-                    "description": t.get("description", ""),
-                    "deadline": t.get("deadline"),
-                    "links": [
-                        l if isinstance(l, dict) else {"label": "Link", "url": l}
-                        for l in t.get("links", [])
-                    ],
-                    "reminded": [],
-                    "created_at": datetime.now().strftime("%Y-%m-%d %H:%M")
-                }
+            for task in tasks:
+                # ON CONFLICT: replay dari antrian offline boleh diulang tanpa duplikat
                 cur.execute("""
                     INSERT INTO tasks (id, name, description, deadline, links, reminded, created_at)
                     VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (id) DO NOTHING
                 """, (
                     task["id"], task["name"], task["description"],
                     task["deadline"], json.dumps(task["links"]),
                     json.dumps(task["reminded"]), task["created_at"]
                 ))
-                added.append(task)
         conn.commit()
-    return added
+    return tasks
 
-def delete_task(tasks: list, task_id: str) -> bool:
+def _delete_task(task_id: str) -> bool:
     with get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute("DELETE FROM tasks WHERE id = %s", (task_id,))
@@ -75,10 +115,7 @@ def delete_task(tasks: list, task_id: str) -> bool:
         conn.commit()
     return deleted
 
-def update_task(tasks: list, task_id: str, fields: dict) -> bool:
-    if not fields:
-        return False
-    
+def _update_task(task_id: str, fields: dict) -> bool:
     # Handle special JSON fields
     set_clauses = []
     values = []
@@ -100,5 +137,49 @@ def update_task(tasks: list, task_id: str, fields: dict) -> bool:
         conn.commit()
     return updated
 
+def apply_operation(kind: str, payload: dict):
+    """Jalankan satu operasi antrian langsung ke DB (dipakai juga saat replay)."""
+    if kind == "add":
+        return _insert_tasks(payload["tasks"])
+    if kind == "delete":
+        return _delete_task(payload["id"])
+    if kind == "update":
+        return _update_task(payload["id"], payload["fields"])
+    raise ValueError(f"Operasi antrian tidak dikenal: {kind}")
+
+def _run_or_enqueue(kind: str, payload: dict) -> tuple:
+    """Coba tulis ke DB; kalau DB down (atau antrian belum kosong), masukkan ke antrian offline.
+
+    Return (True, hasil) kalau langsung tertulis, (False, None) kalau masuk antrian.
+    """
+    if not _db_down and not offline_queue.has_pending(offline_queue.DB_KINDS):
+        try:
+            return True, apply_operation(kind, payload)
+        except DB_ERRORS as e:
+            print(f"⚠️ Database tidak tersedia, '{kind}' masuk antrian offline: {e}")
+            mark_db_down()
+    offline_queue.enqueue(kind, payload)
+    return False, None
+
+# Snapshot lokal ikut diperbarui supaya tetap akurat kalau DB down setelah ini
+def add_tasks(tasks: list, new_tasks: list) -> tuple:
+    """Return (added, queued) — queued True kalau tugas baru masuk antrian offline."""
+    added = [build_task(t) for t in new_tasks]
+    written, _ = _run_or_enqueue("add", {"tasks": added})
+    offline_queue.snapshot_add(added)
+    return added, not written
+
+def delete_task(tasks: list, task_id: str) -> bool:
+    written, deleted = _run_or_enqueue("delete", {"id": task_id})
+    in_snapshot = offline_queue.snapshot_delete(task_id)
+    return deleted if written else in_snapshot
+
+def update_task(tasks: list, task_id: str, fields: dict) -> bool:
+    if not fields:
+        return False
+    written, updated = _run_or_enqueue("update", {"id": task_id, "fields": fields})
+    in_snapshot = offline_queue.snapshot_update(task_id, fields)
+    return updated if written else in_snapshot
+
 def get_all_tasks() -> list:
     return load_tasks()